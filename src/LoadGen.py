@@ -0,0 +1,159 @@
+"""
+Generador de carga para el servicio de búsqueda (Server.py)
+
+Abre varias conexiones concurrentes contra el servidor, envía consultas y
+resume latencia, rendimiento y los contadores del servidor. Con --spawn
+levanta el servidor en el mismo proceso en un puerto libre de localhost.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from Server import MAX_LINE, PathfindingServer
+
+
+class LoadClient:
+    """Cliente JSON por líneas para el servicio de búsqueda"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+        return cls(reader, writer)
+
+    async def request(self, payload):
+        self.writer.write(json.dumps(payload).encode() + b"\n")
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("El servidor cerró la conexión")
+        return json.loads(line)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def make_queries(map_id, count, distinct, seed=0):
+    """Genera consultas; 'distinct' controla cuántas variantes distintas hay"""
+    rng = random.Random(seed)
+    variants = []
+    for i in range(distinct):
+        if i % 2 == 0:
+            variants.append({"op": "search", "map_id": map_id,
+                             "algorithm": "beam", "beta": 1 + i // 2})
+        else:
+            variants.append({"op": "search", "map_id": map_id,
+                             "algorithm": "dynamic", "epsilon": 0.5 + 0.25 * (i // 2)})
+    return [rng.choice(variants) for _ in range(count)]
+
+
+async def run_load(host, port, map_id, map_data, connections=8, requests=200,
+                   distinct=4):
+    """Ejecuta la carga y devuelve un resumen como diccionario"""
+    control = await LoadClient.connect(host, port)
+    if map_data is not None:
+        await control.request({"op": "load", "map_id": map_id, "map": map_data})
+
+    queue = asyncio.Queue()
+    for query in make_queries(map_id, requests, distinct):
+        queue.put_nowait(query)
+
+    latencies = []
+    results = {"ok": 0, "busy": 0, "error": 0, "coalesced": 0}
+
+    async def client_loop():
+        client = await LoadClient.connect(host, port)
+        try:
+            while not queue.empty():
+                query = queue.get_nowait()
+                start_time = time.perf_counter()
+                response = await client.request(query)
+                latencies.append(time.perf_counter() - start_time)
+                if response.get("ok"):
+                    results["ok"] += 1
+                    if response.get("coalesced"):
+                        results["coalesced"] += 1
+                elif response.get("error") == "busy":
+                    results["busy"] += 1
+                else:
+                    results["error"] += 1
+        finally:
+            await client.close()
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(connections)))
+    elapsed = time.perf_counter() - start_time
+
+    server_stats = (await control.request({"op": "stats"}))["stats"]
+    await control.close()
+
+    latencies.sort()
+    summary = dict(results)
+    summary.update({
+        "requests": requests,
+        "elapsed": elapsed,
+        "throughput": requests / elapsed if elapsed > 0 else 0.0,
+        "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+        "latency_p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        "server": server_stats
+    })
+    return summary
+
+
+async def run_spawned(args, map_data):
+    """Levanta el servidor en localhost, ejecuta la carga y lo detiene"""
+    server = PathfindingServer("127.0.0.1", 0, args.workers, args.queue_size)
+    await server.start()
+    try:
+        return await run_load("127.0.0.1", server.port, args.map_id, map_data,
+                              args.connections, args.requests, args.distinct)
+    finally:
+        await server.close()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Generador de carga para Server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--spawn", action="store_true",
+                        help="Levantar el servidor en este proceso (puerto libre)")
+    parser.add_argument("--map", default="map_example.json",
+                        help="Archivo de mapa a cargar en el servidor")
+    parser.add_argument("--map-id", default="default")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=4,
+                        help="Número de consultas distintas (menos = más agrupación)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=64)
+    args = parser.parse_args()
+
+    map_data = None
+    if args.map:
+        with open(args.map, "r") as f:
+            map_data = json.load(f)
+
+    if args.spawn:
+        summary = asyncio.run(run_spawned(args, map_data))
+    else:
+        summary = asyncio.run(run_load(args.host, args.port, args.map_id, map_data,
+                                       args.connections, args.requests, args.distinct))
+
+    server_stats = summary.pop("server")
+    print("Cliente:")
+    for key, value in summary.items():
+        print(f"  {key}: {value:.4f}" if isinstance(value, float) else f"  {key}: {value}")
+    print("Servidor:")
+    for key, value in server_stats.items():
+        print(f"  {key}: {value:.4f}" if isinstance(value, float) else f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -120,9 +120,14 @@ class AntPathfinderGUI:
         self.animating = False
         self.ant_position = None
         self.path_index = 0
+        self.path_iter = None  # Iterador perezoso sobre el camino compacto
         self.animation_speed = 5  # FPS
         self.last_move_time = 0
         
+        # Reproducción de trazas (ver Trace.py)
+        self.trace_frontier = None
+        self.trace_expanded = None
+        
         # Modo de edición
         self.edit_mode = GridMap.EMPTY
         self.edit_mode_names = {
@@ -258,7 +263,8 @@ class AntPathfinderGUI:
                         if self.grid_map.get_cell(j, i) == GridMap.START:
                             self.grid_map.set_cell(j, i, GridMap.EMPTY)
             
-            elif self.edit_mode == GridMap.GOAL:
+            elif self.edit_mode == GridMap.GOAL and not pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                # Con Shift se agrega un objetivo adicional
                 for i in range(self.grid_height):
                     for j in range(self.grid_width):
                         if self.grid_map.get_cell(j, i) == GridMap.GOAL:
@@ -275,10 +281,11 @@ class AntPathfinderGUI:
         
         if self.algorithm == "beam":
             beta = int(self.sliders["beta"].value)
-            self.path, self.stats = beam_search(self.grid_map, beta=beta)
+            self.path, self.stats = beam_search(self.grid_map, beta=beta, compact=True)
         else:  # dynamic
             epsilon = self.sliders["epsilon"].value
-            self.path, self.stats = dynamic_weighted_astar(self.grid_map, epsilon=epsilon)
+            self.path, self.stats = dynamic_weighted_astar(self.grid_map, epsilon=epsilon,
+                                                           compact=True)
         
         end_time = time.time()
         
@@ -286,20 +293,29 @@ class AntPathfinderGUI:
             self.stats["time"] = end_time - start_time
         
         if self.path:
-            self.ant_position = self.path[0]
+            self.reset_animation()
     
     def reset_animation(self):
         """Reinicia la animación"""
         self.animating = False
         self.path_index = 0
         if self.path:
-            self.ant_position = self.path[0]
+            self.path_iter = iter(self.path)
+            self.ant_position = next(self.path_iter)
+    
+    def next_position(self):
+        """Avanza el iterador del camino; devuelve False al llegar al final"""
+        position = next(self.path_iter, None) if self.path_iter else None
+        if position is None:
+            return False
+        self.path_index += 1
+        self.ant_position = position
+        return True
     
     def step_animation(self):
         """Avanza un paso en la animación"""
-        if self.path and self.path_index < len(self.path) - 1:
-            self.path_index += 1
-            self.ant_position = self.path[self.path_index]
+        if self.path:
+            self.next_position()
     
     def update_animation(self):
         """Actualiza la animación automática"""
@@ -307,10 +323,7 @@ class AntPathfinderGUI:
             current_time = time.time()
             if current_time - self.last_move_time > 1.0 / self.sliders["speed"].value:
                 self.last_move_time = current_time
-                if self.path_index < len(self.path) - 1:
-                    self.path_index += 1
-                    self.ant_position = self.path[self.path_index]
-                else:
+                if not self.next_position():
                     self.animating = False
     
     def clear_map(self):
@@ -322,15 +335,8 @@ class AntPathfinderGUI:
     
     def save_map(self):
         """Guarda el mapa en un archivo JSON"""
-        data = {
-            "width": self.grid_width,
-            "height": self.grid_height,
-            "grid": self.grid_map.grid,
-            "start": self.grid_map.start,
-            "goal": self.grid_map.goal
-        }
         with open("map.json", "w") as f:
-            json.dump(data, f)
+            json.dump(self.grid_map.to_dict(), f)
         print("Mapa guardado en map.json")
     
     def load_map(self):
@@ -341,10 +347,7 @@ class AntPathfinderGUI:
             
             self.grid_width = data["width"]
             self.grid_height = data["height"]
-            self.grid_map = GridMap(self.grid_width, self.grid_height)
-            self.grid_map.grid = data["grid"]
-            self.grid_map.start = tuple(data["start"]) if data["start"] else None
-            self.grid_map.goal = tuple(data["goal"]) if data["goal"] else None
+            self.grid_map = GridMap.from_dict(data)
             
             self.reset_animation()
             print("Mapa cargado desde map.json")
@@ -358,6 +361,10 @@ class AntPathfinderGUI:
         # Dibujar grid
         self.draw_grid()
         
+        # Dibujar traza reproducida
+        if self.trace_frontier is not None:
+            self.draw_trace()
+        
         # Dibujar path
         if self.path:
             self.draw_path()
@@ -396,12 +403,25 @@ class AntPathfinderGUI:
                 pygame.draw.rect(self.screen, color, rect)
                 pygame.draw.rect(self.screen, GRAY, rect, 1)
     
+    def draw_trace(self):
+        """Dibuja los nodos expandidos y la frontera de una traza"""
+        for x, y in self.trace_expanded:
+            rect = pygame.Rect(x * self.cell_size + 4, y * self.cell_size + 4,
+                               self.cell_size - 8, self.cell_size - 8)
+            pygame.draw.rect(self.screen, LIGHT_BLUE, rect)
+        
+        for x, y in self.trace_frontier:
+            rect = pygame.Rect(x * self.cell_size + 4, y * self.cell_size + 4,
+                               self.cell_size - 8, self.cell_size - 8)
+            pygame.draw.rect(self.screen, DARK_GREEN, rect, 2)
+    
     def draw_path(self):
         """Dibuja el camino encontrado"""
-        if len(self.path) > 1:
-            for i in range(len(self.path) - 1):
-                x1, y1 = self.path[i]
-                x2, y2 = self.path[i + 1]
+        previous = None
+        for position in self.path:
+            if previous is not None:
+                x1, y1 = previous
+                x2, y2 = position
                 
                 center1 = (x1 * self.cell_size + self.cell_size // 2,
                           y1 * self.cell_size + self.cell_size // 2)
@@ -409,6 +429,7 @@ class AntPathfinderGUI:
                           y2 * self.cell_size + self.cell_size // 2)
                 
                 pygame.draw.line(self.screen, YELLOW, center1, center2, 3)
+            previous = position
     
     def draw_ant(self):
         """Dibuja la hormiga"""
@@ -0,0 +1,193 @@
+"""
+Representación compacta de caminos: celda inicial + movimientos en RLE
+
+Un camino se guarda como la celda de inicio y una secuencia de tramos
+(dirección, repeticiones) en un array('I'), donde cada entrada vale
+repeticiones << 2 | dirección. El costo y la longitud se guardan aparte,
+por lo que se pueden consultar sin expandir el camino.
+"""
+import struct
+import sys
+from array import array
+
+
+# Mismo orden que GridMap.get_neighbors: arriba, derecha, abajo, izquierda
+DIRECTIONS = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+DIRECTION_INDEX = {delta: i for i, delta in enumerate(DIRECTIONS)}
+DIRECTION_LETTERS = "URDL"
+
+MAGIC = b"ANTPATH2"
+# Cabecera binaria: magic, x inicial, y inicial, número de tramos, banderas, costo
+HEADER = struct.Struct("<8sIIIB7xd")
+RUN_SIZE = 4  # Bytes por tramo (uint32)
+# El costo era entero (se guarda como double, exacto hasta 2**53)
+FLAG_INT_COST = 1
+
+
+class CompactPath:
+    """Camino codificado como inicio + tramos de movimientos repetidos"""
+
+    def __init__(self, start, runs=None, cost=0):
+        self.start = tuple(start)
+        self.runs = runs if runs is not None else array('I')
+        self.cost = cost
+        self.length = 1 + sum(run >> 2 for run in self.runs)
+
+    @classmethod
+    def from_node(cls, node):
+        """Codifica el camino que termina en 'node' siguiendo Node.parent"""
+        runs = array('I')
+        current = node
+        direction = None
+        count = 0
+        while current.parent is not None:
+            x, y = current.position
+            px, py = current.parent.position
+            step = DIRECTION_INDEX[(x - px, y - py)]
+            if step == direction:
+                count += 1
+            else:
+                if count:
+                    runs.append(count << 2 | direction)
+                direction = step
+                count = 1
+            current = current.parent
+        if count:
+            runs.append(count << 2 | direction)
+        # Los tramos se recolectaron del objetivo al inicio
+        runs.reverse()
+        return cls(current.position, runs, node.g)
+
+    @classmethod
+    def from_positions(cls, positions, grid_map=None):
+        """
+        Codifica una lista de posiciones adyacentes
+
+        Si se da grid_map, el costo se calcula con GridMap.get_cost; si no,
+        cada paso cuesta 1. Un camino vacío lanza ValueError.
+        """
+        positions = iter(positions)
+        first = next(positions, None)
+        if first is None:
+            raise ValueError("No se puede codificar un camino vacío")
+        start = tuple(first)
+        runs = array('I')
+        cost = 0
+        px, py = start
+        direction = None
+        count = 0
+        for x, y in positions:
+            step = DIRECTION_INDEX.get((x - px, y - py))
+            if step is None:
+                raise ValueError(f"Posiciones no adyacentes: {(px, py)} -> {(x, y)}")
+            cost += grid_map.get_cost(x, y) if grid_map else 1
+            if step == direction:
+                count += 1
+            else:
+                if count:
+                    runs.append(count << 2 | direction)
+                direction = step
+                count = 1
+            px, py = x, y
+        if count:
+            runs.append(count << 2 | direction)
+        return cls(start, runs, cost)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        """Recorre las posiciones del camino sin construir la lista completa"""
+        x, y = self.start
+        yield (x, y)
+        for run in self.runs:
+            dx, dy = DIRECTIONS[run & 3]
+            for _ in range(run >> 2):
+                x += dx
+                y += dy
+                yield (x, y)
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactPath):
+            return NotImplemented
+        return self.start == other.start and self.runs == other.runs
+
+    def __repr__(self):
+        return f"CompactPath(start={self.start}, moves={self.moves()!r}, cost={self.cost})"
+
+    @property
+    def end(self):
+        """Última celda del camino, calculada a partir de los tramos"""
+        x, y = self.start
+        for run in self.runs:
+            dx, dy = DIRECTIONS[run & 3]
+            x += dx * (run >> 2)
+            y += dy * (run >> 2)
+        return (x, y)
+
+    def to_list(self):
+        return list(self)
+
+    def moves(self):
+        """Movimientos como texto, p. ej. 'R3D2L1'"""
+        return "".join(f"{DIRECTION_LETTERS[run & 3]}{run >> 2}" for run in self.runs)
+
+    def to_json(self):
+        """Diccionario serializable con json.dumps"""
+        return {
+            "start": list(self.start),
+            "moves": self.moves(),
+            "length": self.length,
+            "cost": self.cost
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        runs = array('I')
+        moves = data["moves"]
+        i = 0
+        while i < len(moves):
+            direction = DIRECTION_LETTERS.index(moves[i])
+            j = i + 1
+            while j < len(moves) and moves[j].isdigit():
+                j += 1
+            runs.append(int(moves[i + 1:j]) << 2 | direction)
+            i = j
+        return cls(data["start"], runs, data.get("cost", 0))
+
+    def to_bytes(self):
+        """Formato binario: cabecera fija + tramos uint32 little-endian"""
+        runs = array('I', self.runs)
+        if sys.byteorder == "big":
+            runs.byteswap()
+        x, y = self.start
+        flags = FLAG_INT_COST if isinstance(self.cost, int) else 0
+        return HEADER.pack(MAGIC, x, y, len(runs), flags, self.cost) + runs.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("Camino compacto truncado: falta la cabecera")
+        magic, x, y, count, flags, cost = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("No es un camino compacto")
+        if len(data) != HEADER.size + count * RUN_SIZE:
+            raise ValueError(f"Camino compacto de {len(data)} bytes; se esperaban "
+                             f"{HEADER.size + count * RUN_SIZE} para {count} tramos")
+        if flags & FLAG_INT_COST:
+            cost = int(cost)
+        runs = array('I')
+        runs.frombytes(data[HEADER.size:])
+        if sys.byteorder == "big":
+            runs.byteswap()
+        return cls((x, y), runs, cost)
+
+
+def encode_path(positions, grid_map=None):
+    """Lista de posiciones -> CompactPath (ValueError si está vacía)"""
+    return CompactPath.from_positions(positions, grid_map)
+
+
+def decode_path(path):
+    """CompactPath -> lista de posiciones"""
+    return path.to_list()
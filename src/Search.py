@@ -2,8 +2,13 @@
 Algoritmos de búsqueda: Beam Search y Dynamic Weighting A*
 """
 import heapq
-from collections import deque
+from array import array
+from collections import deque, OrderedDict
 import math
+import threading
+
+from Path import CompactPath
+from Trace import EXPAND, GENERATE, RESET, KEEP, GOAL
 
 
 class Node:
@@ -36,6 +41,176 @@ class Node:
         return hash(self.position)
 
 
+class HeuristicTable:
+    """
+    Tabla precalculada de h(n) para todas las celdas del mapa
+    
+    La tabla se construye una vez por conjunto de objetivos fila por fila y
+    se guarda en una caché LRU compartida entre consultas, limitada por el
+    total de valores guardados (8 bytes cada uno). Con varios objetivos cada
+    fila es la envolvente inferior de las distancias a los objetivos, por lo
+    que el costo es O(celdas + filas × objetivos) y no celdas × objetivos.
+    Durante la búsqueda, h(n) es una lectura indexada: values[y * width + x].
+    """
+    
+    CACHE_VALUES = 8 * 1024 * 1024  # 64 MiB de doubles
+    _cache = OrderedDict()
+    _cache_values = 0
+    _lock = threading.Lock()
+    
+    def __init__(self, width, height, values):
+        self.width = width
+        self.height = height
+        self.values = values
+    
+    @classmethod
+    def for_map(cls, grid_map, method='manhattan'):
+        """Tabla al objetivo más cercano de grid_map (usa la caché)"""
+        return cls.for_goals(grid_map.width, grid_map.height, grid_map.goals, method)
+    
+    @classmethod
+    def for_goals(cls, width, height, goals, method='manhattan'):
+        """Tabla al objetivo más cercano de 'goals' (usa la caché)"""
+        goals = tuple(sorted(goals))
+        key = (width, height, goals, method)
+        table = cls._cached(key)
+        if table is None:
+            if len(goals) == 1:
+                values = cls._build_single(width, height, goals[0], method)
+            else:
+                values = cls._build_nearest(width, height, goals, method)
+            table = cls(width, height, values)
+            cls._store(key, table)
+        return table
+    
+    @classmethod
+    def _cached(cls, key):
+        with cls._lock:
+            table = cls._cache.get(key)
+            if table is not None:
+                cls._cache.move_to_end(key)
+            return table
+    
+    @classmethod
+    def _store(cls, key, table):
+        size = len(table.values)
+        if size > cls.CACHE_VALUES:
+            # Una tabla mayor que toda la caché no se guarda
+            return
+        with cls._lock:
+            previous = cls._cache.pop(key, None)
+            if previous is not None:
+                cls._cache_values -= len(previous.values)
+            cls._cache[key] = table
+            cls._cache_values += size
+            while cls._cache_values > cls.CACHE_VALUES:
+                _, evicted = cls._cache.popitem(last=False)
+                cls._cache_values -= len(evicted.values)
+    
+    @classmethod
+    def clear_cache(cls):
+        with cls._lock:
+            cls._cache.clear()
+            cls._cache_values = 0
+    
+    @staticmethod
+    def _build_single(width, height, goal, method):
+        gx, gy = goal
+        values = array('d')
+        if method == 'manhattan':
+            dx = [abs(x - gx) for x in range(width)]
+            for y in range(height):
+                values.extend(map(abs(y - gy).__add__, dx))
+        elif method == 'euclidean':
+            dx2 = [(x - gx)**2 for x in range(width)]
+            for y in range(height):
+                values.extend(map(math.sqrt, map(((y - gy)**2).__add__, dx2)))
+        else:
+            values = array('d', bytes(8 * width * height))
+        return values
+    
+    @classmethod
+    def _build_nearest(cls, width, height, goals, method):
+        """
+        Distancia al objetivo más cercano en una sola pasada
+        
+        En cada fila, cada columna con objetivos aporta una 'V' (manhattan) o
+        una parábola (euclidiana) desplazada por la distancia vertical a su
+        objetivo más cercano; la fila es la envolvente inferior de ellas.
+        """
+        if method not in ('manhattan', 'euclidean'):
+            return array('d', bytes(8 * width * height))
+        columns = {}
+        for gx, gy in goals:
+            columns.setdefault(gx, []).append(gy)
+        columns = sorted(columns.items())
+        values = array('d')
+        for y in range(height):
+            points = [(gx, min(abs(y - gy) for gy in rows)) for gx, rows in columns]
+            if method == 'manhattan':
+                values.extend(cls._manhattan_row(width, points))
+            else:
+                values.extend(map(math.sqrt, cls._squared_row(width, points)))
+        return values
+    
+    @staticmethod
+    def _manhattan_row(width, points):
+        """min |x - gx| + dy sobre los puntos (gx, dy), por barrido en ambos sentidos"""
+        row = [math.inf] * width
+        for gx, dy in points:
+            row[gx] = dy
+        for x in range(1, width):
+            if row[x - 1] + 1 < row[x]:
+                row[x] = row[x - 1] + 1
+        for x in range(width - 2, -1, -1):
+            if row[x + 1] + 1 < row[x]:
+                row[x] = row[x + 1] + 1
+        return row
+    
+    @staticmethod
+    def _squared_row(width, points):
+        """min (x - gx)² + dy² sobre los puntos (gx, dy), ordenados por gx"""
+        # Envolvente inferior de parábolas: vértices y límite izquierdo de cada una
+        vertices = []
+        offsets = []
+        bounds = []
+        for q, dy in points:
+            f = dy * dy
+            bound = -math.inf
+            while vertices:
+                p = vertices[-1]
+                bound = ((f + q * q) - (offsets[-1] + p * p)) / (2 * (q - p))
+                if bound > bounds[-1]:
+                    break
+                vertices.pop()
+                offsets.pop()
+                bounds.pop()
+                bound = -math.inf
+            vertices.append(q)
+            offsets.append(f)
+            bounds.append(bound)
+        
+        row = []
+        k = 0
+        last = len(vertices) - 1
+        for x in range(width):
+            while k < last and bounds[k + 1] < x:
+                k += 1
+            d = x - vertices[k]
+            row.append(d * d + offsets[k])
+        return row
+    
+    def lookup(self, position):
+        """h(n) para una posición"""
+        return self.values[position[1] * self.width + position[0]]
+    
+    def batch(self, positions):
+        """h(n) para una lista de posiciones (p. ej. un nivel completo de la viga)"""
+        values = self.values
+        width = self.width
+        return [values[y * width + x] for x, y in positions]
+
+
 class GridMap:
     """Representa el mapa/matriz del problema"""
     
@@ -51,17 +226,74 @@ class GridMap:
         self.height = height
         self.grid = [[self.EMPTY for _ in range(width)] for _ in range(height)]
         self.start = None
-        self.goal = None
+        self.goals = []  # Posiciones de los hongos (uno o varios)
+        self.goal_set = frozenset()
         self.poison_cost = 5  # Costo extra por pasar por veneno
+    
+    @property
+    def goal(self):
+        """Primer objetivo (compatibilidad con mapas de un solo hongo)"""
+        return self.goals[0] if self.goals else None
+    
+    @goal.setter
+    def goal(self, position):
+        self.set_goals([position] if position else [])
+    
+    def set_goals(self, positions):
+        """Reemplaza la lista de objetivos"""
+        self.goals = []
+        for position in positions:
+            position = tuple(position)
+            if position not in self.goals:
+                self.goals.append(position)
+        self.goal_set = frozenset(self.goals)
+    
+    def add_goal(self, x, y):
+        """Agrega un objetivo sin eliminar los existentes"""
+        self.set_goals(self.goals + [(x, y)])
+    
+    def remove_goal(self, x, y):
+        """Elimina un objetivo si existe"""
+        self.set_goals([goal for goal in self.goals if goal != (x, y)])
         
     def set_cell(self, x, y, cell_type):
         """Establece el tipo de celda en posición (x, y)"""
         if 0 <= x < self.width and 0 <= y < self.height:
+            if (x, y) in self.goal_set and cell_type != self.GOAL:
+                self.remove_goal(x, y)
             self.grid[y][x] = cell_type
             if cell_type == self.START:
                 self.start = (x, y)
             elif cell_type == self.GOAL:
-                self.goal = (x, y)
+                self.add_goal(x, y)
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Crea un mapa a partir del formato JSON de map.json"""
+        grid_map = cls(data["width"], data["height"])
+        grid_map.grid = [list(row) for row in data["grid"]]
+        grid_map.start = tuple(data["start"]) if data.get("start") else None
+        if data.get("goals"):
+            grid_map.set_goals(data["goals"])
+        else:
+            grid_map.goal = tuple(data["goal"]) if data.get("goal") else None
+        # Las celdas de los objetivos se marcan en la matriz (la GUI las dibuja de ahí)
+        for x, y in grid_map.goals:
+            if not (0 <= x < grid_map.width and 0 <= y < grid_map.height):
+                raise ValueError(f"Objetivo fuera del mapa: {(x, y)}")
+            grid_map.grid[y][x] = cls.GOAL
+        return grid_map
+    
+    def to_dict(self):
+        """Convierte el mapa al formato JSON de map.json"""
+        return {
+            "width": self.width,
+            "height": self.height,
+            "grid": self.grid,
+            "start": self.start,
+            "goal": self.goal,
+            "goals": self.goals
+        }
     
     def get_cell(self, x, y):
         """Obtiene el tipo de celda en posición (x, y)"""
@@ -111,7 +343,7 @@ class GridMap:
             return 0
 
 
-def beam_search(grid_map, beta=3, heuristic='manhattan'):
+def beam_search(grid_map, beta=3, heuristic='manhattan', tracer=None, compact=False):
     """
     Beam Search: búsqueda que mantiene solo los β mejores nodos por nivel
     
@@ -119,11 +351,13 @@ def beam_search(grid_map, beta=3, heuristic='manhattan'):
         grid_map: Objeto GridMap con el mapa
         beta: Ancho de la viga (número de nodos a mantener por nivel)
         heuristic: Tipo de heurística ('manhattan' o 'euclidean')
+        tracer: TraceRecorder opcional para grabar la traza de la búsqueda
+        compact: Si es True, la ruta se devuelve como CompactPath
     
     Returns:
         tuple: (ruta, estadísticas)
     """
-    if not grid_map.start or not grid_map.goal:
+    if not grid_map.start or not grid_map.goals:
         return None, {"error": "Start o Goal no definido"}
     
     stats = {
@@ -134,30 +368,41 @@ def beam_search(grid_map, beta=3, heuristic='manhattan'):
         "beam_width": beta
     }
     
+    table = HeuristicTable.for_map(grid_map, heuristic)
+    
     # Inicializar con el nodo de inicio
     start_node = Node(
         position=grid_map.start,
         parent=None,
         g=0,
-        h=grid_map.heuristic(grid_map.start, grid_map.goal, heuristic),
+        h=table.lookup(grid_map.start),
         depth=0
     )
     
     current_level = [start_node]
     visited = set()
     
+    record = None
+    if tracer is not None:
+        tracer.start(grid_map)
+        record = tracer.record
+        record(KEEP, start_node)
+    
     while current_level:
-        next_level = []
+        successors = []
         
         # Expandir todos los nodos del nivel actual
         for node in current_level:
             stats["nodes_expanded"] += 1
             
             # ¿Llegamos al objetivo?
-            if node.position == grid_map.goal:
-                path = reconstruct_path(node)
+            if node.position in grid_map.goal_set:
+                if record:
+                    _record_goal(record, current_level, node)
+                path = CompactPath.from_node(node) if compact else reconstruct_path(node)
                 stats["path_length"] = len(path)
                 stats["path_cost"] = node.g
+                stats["goal"] = node.position
                 return path, stats
             
             visited.add(node.position)
@@ -166,20 +411,26 @@ def beam_search(grid_map, beta=3, heuristic='manhattan'):
             for neighbor_pos in grid_map.get_neighbors(node.position):
                 if neighbor_pos not in visited:
                     cost = grid_map.get_cost(neighbor_pos[0], neighbor_pos[1])
-                    child = Node(
-                        position=neighbor_pos,
-                        parent=node,
-                        g=node.g + cost,
-                        h=grid_map.heuristic(neighbor_pos, grid_map.goal, heuristic),
-                        depth=node.depth + 1
-                    )
-                    next_level.append(child)
-                    stats["nodes_generated"] += 1
+                    successors.append((neighbor_pos, node, node.g + cost))
+        
+        # h(n) de todo el nivel en una sola evaluación por lotes
+        heuristics = table.batch([successor[0] for successor in successors])
+        next_level = [
+            Node(position=position, parent=parent, g=g, h=h, depth=parent.depth + 1)
+            for (position, parent, g), h in zip(successors, heuristics)
+        ]
+        stats["nodes_generated"] += len(next_level)
+        if record:
+            # Un evento por nivel en lugar de uno por sucesor generado
+            tracer.level(current_level[0].depth, len(next_level),
+                         max(0, len(next_level) - beta))
         
         # Mantener solo los β mejores nodos según f(n)
         if next_level:
             next_level.sort(key=lambda n: n.f())
             current_level = next_level[:beta]
+            if record:
+                tracer.record_all(KEEP, current_level)
         else:
             current_level = []
     
@@ -187,7 +438,201 @@ def beam_search(grid_map, beta=3, heuristic='manhattan'):
     return None, stats
 
 
-def dynamic_weighted_astar(grid_map, epsilon=1.5, heuristic='manhattan'):
+def beam_stack_search(grid_map, beta=3, heuristic='manhattan', backtrack_limit=None,
+                      tracer=None, compact=False, expansion_limit=None):
+    """
+    Beam-Stack Search: Beam Search completo con retroceso
+    
+    Cada nivel guarda sus sucesores ordenados por f(n) y se explora por
+    tramos de β nodos. Si un nivel se queda sin sucesores, se retrocede al
+    nivel anterior y se toma el siguiente tramo de alternativas podadas.
+    Un sucesor se descarta si su g no mejora el mejor g ya visto para esa
+    celda en la pasada, por lo que cada celda solo se vuelve a expandir por
+    un camino más barato y una pasada sin solución termina en tiempo casi
+    lineal (en lugar de probar todas las combinaciones de tramos). La
+    memoria queda acotada por β × profundidad más un g por celda. Si se
+    supera el límite de retrocesos o de expansiones de la pasada, se
+    reinicia con el doble de β; con β ≥ celdas del mapa la búsqueda es por
+    anchura sin límites, por lo que siempre termina.
+    
+    Args:
+        grid_map: Objeto GridMap con el mapa
+        beta: Ancho de la viga inicial
+        heuristic: Tipo de heurística ('manhattan' o 'euclidean')
+        backtrack_limit: Retrocesos permitidos antes de reiniciar con 2β
+                         (por defecto, el número de celdas del mapa)
+        expansion_limit: Expansiones por pasada antes de reiniciar con 2β
+                         (por defecto, el número de celdas del mapa)
+        tracer: TraceRecorder opcional para grabar la traza de la búsqueda
+        compact: Si es True, la ruta se devuelve como CompactPath
+    
+    Returns:
+        tuple: (ruta, estadísticas)
+    """
+    if not grid_map.start or not grid_map.goals:
+        return None, {"error": "Start o Goal no definido"}
+    if beta < 1:
+        raise ValueError(f"beta debe ser >= 1 (se recibió {beta})")
+    
+    cells = grid_map.width * grid_map.height
+    if backtrack_limit is None:
+        backtrack_limit = cells
+    if expansion_limit is None:
+        expansion_limit = cells
+    
+    stats = {
+        "nodes_expanded": 0,
+        "nodes_generated": 0,
+        "path_length": 0,
+        "path_cost": 0,
+        "beam_width": beta,
+        "backtracks": 0,
+        "re_expansions": 0,
+        "restarts": 0,
+        "peak_nodes": 0
+    }
+    
+    if tracer is not None:
+        tracer.start(grid_map)
+    
+    table = HeuristicTable.for_map(grid_map, heuristic)
+    expanded = set()  # Celdas expandidas en cualquier pasada (para re_expansions)
+    while True:
+        if beta >= cells:
+            # Viga más ancha que el mapa: búsqueda por anchura sin límites
+            limits = (math.inf, math.inf)
+        else:
+            limits = (backtrack_limit, expansion_limit)
+        node = _beam_stack_round(grid_map, beta, table, limits, stats, expanded, tracer)
+        if node is not False:
+            break
+        # Límite agotado: reiniciar con una viga más ancha
+        stats["restarts"] += 1
+        beta *= 2
+        stats["beam_width"] = beta
+    
+    if node is None:
+        return None, stats
+    
+    path = CompactPath.from_node(node) if compact else reconstruct_path(node)
+    stats["path_length"] = len(path)
+    stats["path_cost"] = node.g
+    stats["goal"] = node.position
+    return path, stats
+
+
+def _beam_stack_round(grid_map, beta, table, limits, stats, expanded, tracer=None):
+    """
+    Una pasada de Beam-Stack Search con β fijo
+    
+    Returns:
+        Node objetivo, None si no hay solución o False si se agotó el
+        límite de retrocesos o de expansiones (limits)
+    """
+    backtrack_limit, expansion_limit = limits
+    start_node = Node(
+        position=grid_map.start,
+        parent=None,
+        g=0,
+        h=table.lookup(grid_map.start),
+        depth=0
+    )
+    
+    h_values = table.values
+    width = table.width
+    
+    # Cada marco de la pila: [capa, sucesores ordenados, siguiente tramo]
+    stack = []
+    # Mejor g visto por celda: poda caminos que no mejoran (incluidos los ciclos)
+    best_g = {start_node.position: 0}
+    stored = 0
+    backtracks = 0
+    expansions = 0
+    
+    layer = [start_node]
+    
+    record = None
+    if tracer is not None:
+        record = tracer.record
+        tracer.mark(RESET)
+        record(KEEP, start_node)
+    
+    while True:
+        # Expandir la capa actual
+        successors = {}
+        expansions += len(layer)
+        if expansions > expansion_limit:
+            return False
+        for node in layer:
+            stats["nodes_expanded"] += 1
+            if node.position in expanded:
+                stats["re_expansions"] += 1
+            else:
+                expanded.add(node.position)
+            
+            # ¿Llegamos al objetivo?
+            if node.position in grid_map.goal_set:
+                if record:
+                    _record_goal(record, layer, node)
+                return node
+        
+        for node in layer:
+            for neighbor_pos in grid_map.get_neighbors(node.position):
+                cost = grid_map.get_cost(neighbor_pos[0], neighbor_pos[1])
+                g = node.g + cost
+                if g < best_g.get(neighbor_pos, math.inf):
+                    best_g[neighbor_pos] = g
+                    successors[neighbor_pos] = Node(
+                        position=neighbor_pos,
+                        parent=node,
+                        g=g,
+                        h=h_values[neighbor_pos[1] * width + neighbor_pos[0]],
+                        depth=node.depth + 1
+                    )
+                stats["nodes_generated"] += 1
+        
+        candidates = sorted(successors.values(), key=lambda n: n.f())
+        if record:
+            tracer.level(layer[0].depth, len(candidates), max(0, len(candidates) - beta))
+        stack.append([layer, candidates, 0])
+        stored += len(layer) + len(candidates)
+        stats["peak_nodes"] = max(stats["peak_nodes"], stored)
+        
+        # Tomar el siguiente tramo de β nodos, retrocediendo si el nivel murió
+        layer = None
+        while stack:
+            frame = stack[-1]
+            frame_layer, frame_candidates, index = frame
+            if index < len(frame_candidates):
+                frame[2] = index + beta
+                # Se omiten los nodos a cuyas celdas ya se llegó con menor g
+                layer = [node for node in frame_candidates[index:index + beta]
+                         if node.g <= best_g[node.position]]
+                if not layer:
+                    layer = None
+                    continue
+                if index > 0:
+                    backtracks += 1
+                    stats["backtracks"] += 1
+                    if backtracks > backtrack_limit:
+                        return False
+                if record:
+                    if index > 0:
+                        # Retroceso: la viga se reemplaza por otro tramo
+                        tracer.mark(RESET)
+                    tracer.record_all(KEEP, layer)
+                break
+            
+            stack.pop()
+            stored -= len(frame_layer) + len(frame_candidates)
+        
+        if layer is None:
+            # Se agotaron todas las alternativas: no hay solución
+            return None
+
+
+def dynamic_weighted_astar(grid_map, epsilon=1.5, heuristic='manhattan', tracer=None,
+                           compact=False):
     """
     Dynamic Weighting A*: ajusta el peso de la heurística dinámicamente
     f(n) = g(n) + h(n) + ε * (1 - d(n)/N) * h(n)
@@ -196,15 +641,21 @@ def dynamic_weighted_astar(grid_map, epsilon=1.5, heuristic='manhattan'):
         grid_map: Objeto GridMap con el mapa
         epsilon: Peso inicial para la heurística
         heuristic: Tipo de heurística ('manhattan' o 'euclidean')
+        tracer: TraceRecorder opcional para grabar la traza de la búsqueda
+        compact: Si es True, la ruta se devuelve como CompactPath
     
     Returns:
         tuple: (ruta, estadísticas)
     """
-    if not grid_map.start or not grid_map.goal:
+    if not grid_map.start or not grid_map.goals:
         return None, {"error": "Start o Goal no definido"}
     
+    table = HeuristicTable.for_map(grid_map, heuristic)
+    h_values = table.values
+    width = table.width
+    
     # Estimación de profundidad máxima N
-    N = grid_map.heuristic(grid_map.start, grid_map.goal, heuristic) * 1.5
+    N = table.lookup(grid_map.start) * 1.5
     if N == 0:
         N = max(grid_map.width, grid_map.height)
     
@@ -222,7 +673,7 @@ def dynamic_weighted_astar(grid_map, epsilon=1.5, heuristic='manhattan'):
         position=grid_map.start,
         parent=None,
         g=0,
-        h=grid_map.heuristic(grid_map.start, grid_map.goal, heuristic),
+        h=table.lookup(grid_map.start),
         depth=0
     )
     
@@ -234,6 +685,12 @@ def dynamic_weighted_astar(grid_map, epsilon=1.5, heuristic='manhattan'):
     open_dict = {start_node.position: start_node}
     closed_set = set()
     
+    record = None
+    if tracer is not None:
+        tracer.start(grid_map)
+        record = tracer.record
+        record(GENERATE, start_node)
+    
     while open_set:
         _, current = heapq.heappop(open_set)
         
@@ -244,16 +701,21 @@ def dynamic_weighted_astar(grid_map, epsilon=1.5, heuristic='manhattan'):
         stats["nodes_expanded"] += 1
         
         # ¿Llegamos al objetivo?
-        if current.position == grid_map.goal:
-            path = reconstruct_path(current)
+        if current.position in grid_map.goal_set:
+            if record:
+                record(EXPAND, current)
+                record(GOAL, current)
+            path = CompactPath.from_node(current) if compact else reconstruct_path(current)
             stats["path_length"] = len(path)
             stats["path_cost"] = current.g
+            stats["goal"] = current.position
             return path, stats
         
         closed_set.add(current.position)
         open_dict.pop(current.position, None)
         
-        # Expandir vecinos
+        # Expandir vecinos (la expansión y sus sucesores se graban juntos)
+        generated = [] if record else None
         for neighbor_pos in grid_map.get_neighbors(current.position):
             if neighbor_pos in closed_set:
                 continue
@@ -269,22 +731,37 @@ def dynamic_weighted_astar(grid_map, epsilon=1.5, heuristic='manhattan'):
                     neighbor.parent = current
                     neighbor.depth = current.depth + 1
                     heapq.heappush(open_set, (neighbor.f(epsilon, N), neighbor))
+                    if record:
+                        generated.append(neighbor)
             else:
                 neighbor = Node(
                     position=neighbor_pos,
                     parent=current,
                     g=tentative_g,
-                    h=grid_map.heuristic(neighbor_pos, grid_map.goal, heuristic),
+                    h=h_values[neighbor_pos[1] * width + neighbor_pos[0]],
                     depth=current.depth + 1
                 )
                 heapq.heappush(open_set, (neighbor.f(epsilon, N), neighbor))
                 open_dict[neighbor_pos] = neighbor
                 stats["nodes_generated"] += 1
+                if record:
+                    generated.append(neighbor)
+        if record:
+            tracer.expansion(current, generated)
     
     # No se encontró solución
     return None, stats
 
 
+def _record_goal(record, level, goal_node):
+    """Graba los nodos del nivel expandidos antes del objetivo y el objetivo"""
+    for node in level:
+        if node is goal_node:
+            break
+        record(EXPAND, node)
+    record(GOAL, goal_node)
+
+
 def reconstruct_path(node):
     """Reconstruye la ruta desde el nodo objetivo hasta el inicio"""
     path = []
@@ -0,0 +1,394 @@
+"""
+Servicio local de búsqueda de caminos (asyncio, JSON delimitado por líneas)
+
+Protocolo: cada petición y cada respuesta es un objeto JSON en una línea.
+    {"op": "load", "map_id": "m1", "map": {...}}      # o "file": "map.json"
+    {"op": "unload", "map_id": "m1"}
+    {"op": "search", "map_id": "m1", "algorithm": "beam", "beta": 3}
+    {"op": "search", "map_id": "m1", "algorithm": "beam_stack", "beta": 1}
+    {"op": "search", "map_id": "m1", "algorithm": "dynamic", "epsilon": 1.5}
+    {"op": "search", "map_id": "m1", "algorithm": "beam", "compact": true}
+    {"op": "stats"}
+
+Los mapas quedan residentes en memoria por id. Las búsquedas idénticas que
+estén en curso se agrupan en una sola ejecución y la cola de trabajo es
+acotada: si está llena se responde {"ok": false, "error": "busy"}.
+Con "compact": true la ruta se devuelve como CompactPath.to_json()
+(inicio + movimientos RLE) en lugar de la lista de celdas.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from Search import GridMap, beam_search, beam_stack_search, dynamic_weighted_astar
+
+
+ALGORITHMS = ("beam", "beam_stack", "dynamic")
+HEURISTICS = ("manhattan", "euclidean")
+
+# Tamaño máximo de una línea (petición o respuesta); los mapas se envían en línea
+MAX_LINE = 64 * 1024 * 1024
+
+
+def run_query(grid_map, algorithm, param, heuristic, compact=False):
+    """Ejecuta una búsqueda (se llama desde el pool de trabajadores)"""
+    start_time = time.perf_counter()
+    if algorithm == "beam":
+        path, stats = beam_search(grid_map, beta=param, heuristic=heuristic,
+                                  compact=compact)
+    elif algorithm == "beam_stack":
+        path, stats = beam_stack_search(grid_map, beta=param, heuristic=heuristic,
+                                        compact=compact)
+    else:
+        path, stats = dynamic_weighted_astar(grid_map, epsilon=param, heuristic=heuristic,
+                                             compact=compact)
+    stats["time"] = time.perf_counter() - start_time
+    if compact and path is not None:
+        path = path.to_json()
+    return path, stats
+
+
+# Mapas residentes en cada proceso trabajador: (map_id, versión) -> GridMap (LRU)
+_WORKER_MAPS = OrderedDict()
+WORKER_MAPS_SIZE = 16
+
+
+def _init_worker(maps):
+    """Inicializador del pool de procesos: precarga los mapas una vez"""
+    _WORKER_MAPS.clear()
+    _WORKER_MAPS.update(maps)
+
+
+def run_resident_query(map_key, algorithm, param, heuristic, compact=False,
+                       grid_map=None):
+    """
+    Ejecuta una búsqueda sobre un mapa residente en el proceso trabajador
+
+    Si el proceso no tiene el mapa (map_id, versión) y no se envió grid_map,
+    devuelve None para que el servidor repita la consulta con el mapa.
+    """
+    if grid_map is not None:
+        # Una nueva versión reemplaza a las anteriores del mismo map_id
+        for key in [key for key in _WORKER_MAPS if key[0] == map_key[0]]:
+            del _WORKER_MAPS[key]
+        _WORKER_MAPS[map_key] = grid_map
+        while len(_WORKER_MAPS) > WORKER_MAPS_SIZE:
+            _WORKER_MAPS.popitem(last=False)
+    else:
+        grid_map = _WORKER_MAPS.get(map_key)
+        if grid_map is None:
+            return None
+        _WORKER_MAPS.move_to_end(map_key)
+    return run_query(grid_map, algorithm, param, heuristic, compact)
+
+
+class ServerCounters:
+    """Contadores de latencia y rendimiento del servicio"""
+
+    def __init__(self, window=1000):
+        self.started = time.perf_counter()
+        self.received = 0
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.searches = 0  # Búsquedas realmente ejecutadas
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.recent = deque(maxlen=window)  # Ventana de latencias recientes
+
+    def record_latency(self, latency):
+        self.completed += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.recent.append(latency)
+
+    def snapshot(self, in_flight, queue_depth):
+        """Devuelve los contadores como diccionario serializable"""
+        uptime = time.perf_counter() - self.started
+        recent = sorted(self.recent)
+
+        def percentile(p):
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))]
+
+        return {
+            "uptime": uptime,
+            "received": self.received,
+            "completed": self.completed,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "searches": self.searches,
+            "in_flight": in_flight,
+            "queue_depth": queue_depth,
+            "throughput": self.completed / uptime if uptime > 0 else 0.0,
+            "latency_avg": self.latency_total / self.completed if self.completed else 0.0,
+            "latency_max": self.latency_max,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95)
+        }
+
+
+class PathfindingServer:
+    """Servidor TCP que mantiene mapas residentes y despacha búsquedas a un pool"""
+
+    def __init__(self, host="127.0.0.1", port=8765, workers=4, queue_size=64,
+                 use_processes=False):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.queue_size = queue_size
+        self.use_processes = use_processes
+
+        self.maps = {}  # map_id -> (versión, GridMap)
+        self._version = 0
+        self._inflight = {}  # clave de la consulta -> Future compartido
+        self._queue = None
+        self._executor = None
+        self._worker_tasks = []
+        self._server = None
+        self.counters = ServerCounters()
+
+    def load_map(self, map_id, data):
+        """Carga (o reemplaza) un mapa residente"""
+        self._version += 1
+        self.maps[map_id] = (self._version, GridMap.from_dict(data))
+
+    def unload_map(self, map_id):
+        """Descarga un mapa residente"""
+        if self.maps.pop(map_id, None) is not None:
+            self._version += 1
+
+    async def start(self):
+        """
+        Inicia el pool de trabajadores y el socket de escucha
+
+        En modo procesos, los mapas cargados antes de iniciar viajan a cada
+        proceso una sola vez (en el inicializador) y las consultas solo envían
+        la clave (map_id, versión). Un mapa cargado después se envía junto con
+        la consulta la primera vez que un proceso no lo tiene; el pool nunca
+        se recrea.
+        """
+        if self.use_processes:
+            maps = {(map_id, version): grid_map
+                    for map_id, (version, grid_map) in self.maps.items()}
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 initializer=_init_worker,
+                                                 initargs=(maps,))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker_tasks = [asyncio.create_task(self._worker())
+                              for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port,
+                                                  limit=MAX_LINE)
+        # Con port=0 el sistema asigna un puerto libre
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Detiene el servidor y libera los trabajadores"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    async def _worker(self):
+        """Toma consultas de la cola acotada y las ejecuta en el pool"""
+        loop = asyncio.get_running_loop()
+        while True:
+            key, grid_map, algorithm, param, heuristic, compact, future = \
+                await self._queue.get()
+            try:
+                if self.use_processes:
+                    # La consulta usa la versión del mapa con la que fue aceptada
+                    result = await loop.run_in_executor(
+                        self._executor, run_resident_query,
+                        key[:2], algorithm, param, heuristic, compact)
+                    if result is None:
+                        result = await loop.run_in_executor(
+                            self._executor, run_resident_query,
+                            key[:2], algorithm, param, heuristic, compact, grid_map)
+                else:
+                    result = await loop.run_in_executor(
+                        self._executor, run_query, grid_map, algorithm, param,
+                        heuristic, compact)
+                self.counters.searches += 1
+                if not future.done():
+                    future.set_result(result)
+            except Exception as exc:
+                if not future.done():
+                    future.set_exception(exc)
+            finally:
+                self._inflight.pop(key, None)
+                self._queue.task_done()
+
+    async def _handle_client(self, reader, writer):
+        """Atiende una conexión: una petición JSON por línea"""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Línea mayor que MAX_LINE: el flujo queda desalineado
+                    response = {"ok": False, "error": f"Petición mayor que {MAX_LINE} bytes"}
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise TypeError("La petición debe ser un objeto JSON")
+                    response = await self._dispatch(request)
+                except (ValueError, KeyError, TypeError, OSError) as exc:
+                    response = {"ok": False, "error": str(exc)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionResetError, asyncio.CancelledError):
+            # Al apagar el servidor las conexiones abiertas se cancelan
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request):
+        op = request.get("op")
+        if op == "search":
+            return await self._search(request)
+        elif op == "load":
+            if "file" in request:
+                with open(request["file"], "r") as f:
+                    data = json.load(f)
+            else:
+                data = request["map"]
+            self.load_map(request["map_id"], data)
+            return {"ok": True, "map_id": request["map_id"]}
+        elif op == "unload":
+            self.unload_map(request["map_id"])
+            return {"ok": True}
+        elif op == "stats":
+            return {"ok": True, "stats": self.stats(), "maps": sorted(self.maps)}
+        return {"ok": False, "error": f"Operación desconocida: {op}"}
+
+    def _parse_search(self, request):
+        """Valida una petición de búsqueda; lanza ValueError si es inválida"""
+        map_id = request.get("map_id")
+        if not isinstance(map_id, str):
+            raise ValueError(f"map_id debe ser un texto: {map_id!r}")
+        if map_id not in self.maps:
+            raise ValueError(f"Mapa no cargado: {map_id}")
+        version, grid_map = self.maps[map_id]
+
+        algorithm = request.get("algorithm", "beam")
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Algoritmo desconocido: {algorithm}")
+        try:
+            if algorithm in ("beam", "beam_stack"):
+                param = int(request.get("beta", 3))
+            else:
+                param = float(request.get("epsilon", 1.5))
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError("Parámetro beta/epsilon inválido")
+        if algorithm in ("beam", "beam_stack") and param < 1:
+            raise ValueError(f"beta debe ser >= 1: {param}")
+        heuristic = request.get("heuristic", "manhattan")
+        if not isinstance(heuristic, str) or heuristic not in HEURISTICS:
+            raise ValueError(f"Heurística desconocida: {heuristic!r}")
+        compact = bool(request.get("compact", False))
+        return map_id, version, grid_map, algorithm, param, heuristic, compact
+
+    async def _search(self, request):
+        self.counters.received += 1
+        start_time = time.perf_counter()
+
+        try:
+            map_id, version, grid_map, algorithm, param, heuristic, compact = \
+                self._parse_search(request)
+        except ValueError as exc:
+            self.counters.failed += 1
+            return {"ok": False, "error": str(exc)}
+
+        # Consultas idénticas en curso comparten una sola búsqueda
+        key = (map_id, version, algorithm, param, heuristic, compact)
+        future = self._inflight.get(key)
+        coalesced = future is not None
+        if coalesced:
+            self.counters.coalesced += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            try:
+                self._queue.put_nowait((key, grid_map, algorithm, param, heuristic,
+                                        compact, future))
+            except asyncio.QueueFull:
+                self.counters.rejected += 1
+                return {"ok": False, "error": "busy"}
+            self._inflight[key] = future
+
+        try:
+            path, stats = await asyncio.shield(future)
+        except Exception as exc:
+            self.counters.failed += 1
+            return {"ok": False, "error": str(exc)}
+
+        self.counters.record_latency(time.perf_counter() - start_time)
+        return {"ok": True, "path": path, "stats": dict(stats), "coalesced": coalesced}
+
+    def stats(self):
+        """Contadores actuales del servicio"""
+        return self.counters.snapshot(len(self._inflight),
+                                      self._queue.qsize() if self._queue else 0)
+
+
+def parse_map_args(values):
+    """Convierte argumentos 'id=archivo.json' en un diccionario"""
+    maps = {}
+    for value in values or []:
+        map_id, _, path = value.partition("=")
+        if not path:
+            raise argparse.ArgumentTypeError(f"Formato esperado id=archivo.json: {value}")
+        with open(path, "r") as f:
+            maps[map_id] = json.load(f)
+    return maps
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Servicio local de búsqueda de caminos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--processes", action="store_true",
+                        help="Usar un pool de procesos en lugar de hilos")
+    parser.add_argument("--map", action="append", metavar="ID=ARCHIVO",
+                        help="Mapa a precargar (se puede repetir)")
+    args = parser.parse_args()
+
+    server = PathfindingServer(args.host, args.port, args.workers,
+                               args.queue_size, args.processes)
+    for map_id, data in parse_map_args(args.map).items():
+        server.load_map(map_id, data)
+
+    print(f"Escuchando en {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Grabación binaria de trazas de búsqueda y reproducción
+
+Las búsquedas aceptan un TraceRecorder opcional que escribe los eventos de la
+búsqueda como registros binarios de ancho fijo en un archivo con buffer y
+tamaño máximo. A* graba cada expansión junto con sus sucesores generados en
+una sola llamada; las variantes de Beam Search graban un evento LEVEL por
+nivel (con el número de sucesores generados y podados) más los nodos
+conservados en la viga, ya que grabar cada sucesor duplicaba el tiempo de
+búsqueda. Cada registro cuesta unos 0.4 µs, por lo que la sobrecarga va de
+~5% a ~25% según el trabajo por nodo de la búsqueda (ver README).
+TraceReplay reconstruye la frontera a lo largo del tiempo sin volver a
+ejecutar la búsqueda, ya sea en modo resumen o sobre la GUI.
+
+Uso:
+    python Trace.py record ../map_example.json traza.bin --algorithm beam --beta 3
+    python Trace.py replay traza.bin
+    python Trace.py replay traza.bin --gui ../map_example.json
+"""
+import argparse
+import json
+import struct
+
+
+# Tipos de evento
+EXPAND = 1    # Nodo expandido (sale de la frontera)
+GENERATE = 2  # Nodo generado (entra a la frontera)
+RESET = 3     # La frontera se descarta (retroceso en Beam-Stack Search)
+KEEP = 4      # Nodo conservado en la viga tras la poda
+GOAL = 5      # Objetivo alcanzado
+LEVEL = 6     # Nivel de la viga expandido (g = generados, h = podados)
+
+EVENT_NAMES = {
+    EXPAND: "expand",
+    GENERATE: "generate",
+    RESET: "reset",
+    KEEP: "keep",
+    GOAL: "goal",
+    LEVEL: "level"
+}
+
+MAGIC = b"ANTTRC01"
+FLAG_TRUNCATED = 1
+
+# Cabecera: magic, ancho, alto, banderas
+HEADER = struct.Struct("<8sHHB3x")
+# Registro: evento, x, y, profundidad, g, h
+RECORD = struct.Struct("<BxHHIff")
+FIELDS = 6
+# Los eventos pendientes se empaquetan en bloques de CHUNK registros con un
+# único Struct compilado una sola vez (compilar uno por tamaño de lote costaba
+# más que una búsqueda corta)
+CHUNK = 256
+CHUNK_RECORDS = struct.Struct("<" + RECORD.format.lstrip("<") * CHUNK)
+CHUNK_FIELDS = CHUNK * FIELDS
+
+
+class TraceRecorder:
+    """Escribe eventos de búsqueda como registros binarios de ancho fijo"""
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, buffer_records=4096):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.buffer_records = buffer_records
+        self.truncated = False
+        self.records = 0
+        self._file = open(path, "wb")
+        # Los campos de los eventos se acumulan en una lista plana y se
+        # empaquetan por lotes (retener una tupla por evento activaría el
+        # recolector de basura con frecuencia)
+        self._pending = []
+        self._limit = buffer_records * FIELDS
+        self._written = 0
+        self._width = 0
+        self._height = 0
+        self._write_header()
+
+    def _write_header(self):
+        flags = FLAG_TRUNCATED if self.truncated else 0
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, self._width, self._height, flags))
+        self._written = max(self._written, HEADER.size)
+        self._file.seek(self._written)
+
+    def start(self, grid_map):
+        """Registra las dimensiones del mapa (lo llaman las búsquedas)"""
+        self._width = grid_map.width
+        self._height = grid_map.height
+        self._write_header()
+
+    def record(self, event, node):
+        """Agrega un evento; al superar max_bytes la traza se trunca"""
+        pending = self._pending
+        x, y = node.position
+        pending += (event, x, y, node.depth, node.g, node.h)
+        if len(pending) >= self._limit:
+            self.flush()
+
+    def record_all(self, event, nodes):
+        """Agrega el mismo evento para varios nodos (p. ej. KEEP de una viga)"""
+        pending = self._pending
+        for node in nodes:
+            x, y = node.position
+            pending += (event, x, y, node.depth, node.g, node.h)
+        if len(pending) >= self._limit:
+            self.flush()
+
+    def expansion(self, node, generated):
+        """Agrega EXPAND de 'node' y GENERATE de sus sucesores en una llamada"""
+        pending = self._pending
+        x, y = node.position
+        pending += (EXPAND, x, y, node.depth, node.g, node.h)
+        for child in generated:
+            x, y = child.position
+            pending += (GENERATE, x, y, child.depth, child.g, child.h)
+        if len(pending) >= self._limit:
+            self.flush()
+
+    def mark(self, event):
+        """Agrega un evento sin nodo asociado (p. ej. RESET)"""
+        self._pending += (event, 0, 0, 0, 0, 0)
+
+    def level(self, depth, generated, pruned):
+        """Agrega un evento LEVEL: la viga de profundidad 'depth' fue expandida"""
+        self._pending += (LEVEL, 0, 0, depth, generated, pruned)
+
+    def flush(self):
+        """Escribe los eventos pendientes respetando el tamaño máximo del archivo"""
+        pending = self._pending
+        if not pending:
+            return
+        if self.truncated:
+            pending.clear()
+            return
+        size = len(pending) // FIELDS * RECORD.size
+        # Se rellena hasta un bloque completo y se recorta el resultado
+        pending += (0,) * (-len(pending) % CHUNK_FIELDS)
+        pack = CHUNK_RECORDS.pack
+        data = b"".join(pack(*pending[i:i + CHUNK_FIELDS])
+                        for i in range(0, len(pending), CHUNK_FIELDS))[:size]
+        room = self.max_bytes - self._written
+        if len(data) > room:
+            # Solo se escriben registros completos
+            room = max(room - room % RECORD.size, 0)
+            data = data[:room]
+            self.truncated = True
+        self._file.write(data)
+        self._written += len(data)
+        self.records += len(data) // RECORD.size
+        pending.clear()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        if self.truncated:
+            self._write_header()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_trace(path):
+    """
+    Lee una traza completa
+
+    Returns:
+        tuple: (cabecera, lista de registros (evento, x, y, profundidad, g, h))
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, width, height, flags = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"No es un archivo de traza: {path}")
+    body = memoryview(data)[HEADER.size:]
+    body = body[:len(body) - len(body) % RECORD.size]
+    header = {
+        "width": width,
+        "height": height,
+        "truncated": bool(flags & FLAG_TRUNCATED)
+    }
+    return header, list(RECORD.iter_unpack(body))
+
+
+class TraceReplay:
+    """Reconstruye la frontera y los nodos expandidos evento a evento"""
+
+    def __init__(self, path):
+        self.header, self.records = read_trace(path)
+        self.rewind()
+
+    def rewind(self):
+        self.index = 0
+        self.frontier = set()
+        self.expanded = set()
+        self.current = None
+        self.goal = None
+
+    def done(self):
+        return self.index >= len(self.records)
+
+    def step(self, count=1):
+        """Aplica los siguientes 'count' eventos"""
+        frontier = self.frontier
+        expanded = self.expanded
+        end = min(self.index + count, len(self.records))
+        for event, x, y, _, _, _ in self.records[self.index:end]:
+            position = (x, y)
+            if event == GENERATE or event == KEEP:
+                frontier.add(position)
+            elif event == EXPAND:
+                frontier.discard(position)
+                expanded.add(position)
+                self.current = position
+            elif event == LEVEL:
+                # Toda la viga se expandió; sus sucesores llegan como KEEP
+                expanded.update(frontier)
+                frontier.clear()
+            elif event == RESET:
+                frontier.clear()
+            elif event == GOAL:
+                frontier.discard(position)
+                expanded.add(position)
+                self.goal = position
+        self.index = end
+
+    def frontier_sizes(self, sample_every=1):
+        """Tamaño de la frontera a lo largo de la traza"""
+        self.rewind()
+        sizes = []
+        while not self.done():
+            self.step(sample_every)
+            sizes.append(len(self.frontier))
+        return sizes
+
+    def summary(self):
+        """Resumen de la traza sin GUI"""
+        counts = {name: 0 for name in EVENT_NAMES.values()}
+        for record in self.records:
+            name = EVENT_NAMES.get(record[0], "unknown")
+            counts[name] = counts.get(name, 0) + 1
+        sizes = self.frontier_sizes()
+        result = dict(self.header)
+        result.update({
+            "records": len(self.records),
+            "events": counts,
+            "max_frontier": max(sizes) if sizes else 0,
+            "final_frontier": sizes[-1] if sizes else 0,
+            "goal": self.goal
+        })
+        return result
+
+
+def replay_gui(trace_path, map_path):
+    """Reproduce una traza sobre el renderizador de AntPathfinderGUI"""
+    import pygame
+    from Main import AntPathfinderGUI
+    from Search import GridMap
+
+    with open(map_path, "r") as f:
+        data = json.load(f)
+
+    app = AntPathfinderGUI()
+    app.grid_width = data["width"]
+    app.grid_height = data["height"]
+    app.grid_map = GridMap.from_dict(data)
+
+    replay = TraceReplay(trace_path)
+    app.trace_frontier = replay.frontier
+    app.trace_expanded = replay.expanded
+
+    while app.running:
+        app.handle_events()
+        if not replay.done():
+            # El slider de velocidad controla los eventos por cuadro
+            replay.step(int(app.sliders["speed"].value))
+            app.ant_position = replay.goal or replay.current
+        app.draw()
+        app.clock.tick(60)
+
+    pygame.quit()
+
+
+def record_search(map_path, trace_path, algorithm="beam", beta=3, epsilon=1.5,
+                  heuristic="manhattan", max_bytes=64 * 1024 * 1024):
+    """Ejecuta una búsqueda grabando su traza"""
+    from Search import GridMap, beam_search, beam_stack_search, dynamic_weighted_astar
+
+    with open(map_path, "r") as f:
+        grid_map = GridMap.from_dict(json.load(f))
+    with TraceRecorder(trace_path, max_bytes=max_bytes) as tracer:
+        if algorithm == "beam":
+            return beam_search(grid_map, beta, heuristic, tracer=tracer)
+        elif algorithm == "beam_stack":
+            return beam_stack_search(grid_map, beta, heuristic, tracer=tracer)
+        return dynamic_weighted_astar(grid_map, epsilon, heuristic, tracer=tracer)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Grabación y reproducción de trazas")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Grabar la traza de una búsqueda")
+    record_parser.add_argument("map")
+    record_parser.add_argument("trace")
+    record_parser.add_argument("--algorithm", default="beam",
+                               choices=["beam", "beam_stack", "dynamic"])
+    record_parser.add_argument("--beta", type=int, default=3)
+    record_parser.add_argument("--epsilon", type=float, default=1.5)
+    record_parser.add_argument("--heuristic", default="manhattan")
+    record_parser.add_argument("--max-bytes", type=int, default=64 * 1024 * 1024)
+
+    replay_parser = subparsers.add_parser("replay", help="Reproducir una traza")
+    replay_parser.add_argument("trace")
+    replay_parser.add_argument("--gui", metavar="MAPA",
+                               help="Reproducir sobre la GUI con este mapa")
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        path, stats = record_search(args.map, args.trace, args.algorithm, args.beta,
+                                    args.epsilon, args.heuristic, args.max_bytes)
+        print(f"Traza guardada en {args.trace}")
+        print(f"Camino encontrado: {path is not None}, estadísticas: {stats}")
+    elif args.gui:
+        replay_gui(args.trace, args.gui)
+    else:
+        for key, value in TraceReplay(args.trace).summary().items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()